@@ -40,6 +40,76 @@ type StyledContent struct {
 	Rows      int           `json:"rows"`
 }
 
+// Attribute bitmask bits in the wire format's "a" arrays
+const (
+	attrBold = 1 << iota
+	attrItalic
+	attrUnderline
+	attrStrikethrough
+	attrInverse
+	attrFaint
+)
+
+// styledLineSoA is the wire format for one line: parallel arrays with one
+// entry per run. The bridge sends null instead for empty lines.
+type styledLineSoA struct {
+	T  []string  `json:"t"`
+	Fg []*string `json:"fg"`
+	Bg []*string `json:"bg"`
+	A  []int     `json:"a"`
+}
+
+// toRuns expands the parallel arrays into StyledRun values
+func (l *styledLineSoA) toRuns() []StyledRun {
+	if l == nil || len(l.T) == 0 {
+		return []StyledRun{}
+	}
+	runs := make([]StyledRun, len(l.T))
+	for i, t := range l.T {
+		run := StyledRun{Text: t}
+		if i < len(l.Fg) && l.Fg[i] != nil {
+			run.FgColor = *l.Fg[i]
+		}
+		if i < len(l.Bg) && l.Bg[i] != nil {
+			run.BgColor = *l.Bg[i]
+		}
+		if i < len(l.A) {
+			a := l.A[i]
+			run.Bold = a&attrBold != 0
+			run.Italic = a&attrItalic != 0
+			run.Underline = a&attrUnderline != 0
+			run.Strikethrough = a&attrStrikethrough != 0
+			run.Inverse = a&attrInverse != 0
+			run.Faint = a&attrFaint != 0
+		}
+		runs[i] = run
+	}
+	return runs
+}
+
+// decodeSoALines decodes a full "lines" payload into StyledRun lines
+func decodeSoALines(raw json.RawMessage) [][]StyledRun {
+	if len(raw) == 0 {
+		return nil
+	}
+	var soa []*styledLineSoA
+	if err := json.Unmarshal(raw, &soa); err != nil {
+		logging.Debug("Bridge: invalid lines payload", "error", err)
+		return nil
+	}
+	lines := make([][]StyledRun, len(soa))
+	for i, l := range soa {
+		lines[i] = l.toRuns()
+	}
+	return lines
+}
+
+// LineChange is a single changed line within a content-delta message
+type LineChange struct {
+	Y    int            `json:"y"`
+	Runs *styledLineSoA `json:"runs"`
+}
+
 // ProfileColors represents the iTerm2 profile color palette
 type ProfileColors struct {
 	Fg     string   `json:"fg"`
@@ -60,6 +130,7 @@ type bridgeMessage struct {
 	SessionID string          `json:"sessionId,omitempty"`
 	Message   string          `json:"message,omitempty"`
 	Lines     json.RawMessage `json:"lines,omitempty"`
+	Changes   []LineChange    `json:"changes,omitempty"`
 	Cursor    *CursorPos      `json:"cursor,omitempty"`
 	Cols      int             `json:"cols,omitempty"`
 	Rows      int             `json:"rows,omitempty"`
@@ -88,6 +159,10 @@ type PythonBridge struct {
 	onProfile func(*ProfileData)
 	onHistory func(*StyledContent)
 	onError   func(string)
+
+	// Last full frame per session, used to reconstruct content-delta messages
+	lastSessionID string
+	lastLines     [][]StyledRun
 }
 
 // NewPythonBridge creates a new bridge instance
@@ -294,16 +369,56 @@ func (b *PythonBridge) readOutput() {
 			b.mu.Lock()
 			handler := b.onContent
 			b.mu.Unlock()
+			content := &StyledContent{
+				SessionID: msg.SessionID,
+				Cols:      msg.Cols,
+				Rows:      msg.Rows,
+			}
+			if msg.Cursor != nil {
+				content.Cursor = *msg.Cursor
+			}
+			content.Lines = decodeSoALines(msg.Lines)
+			b.mu.Lock()
+			b.lastSessionID = msg.SessionID
+			b.lastLines = content.Lines
+			b.mu.Unlock()
+			if handler != nil {
+				handler(content)
+			}
+
+		case "content-delta":
+			b.mu.Lock()
+			handler := b.onContent
+			valid := msg.SessionID == b.lastSessionID && b.lastLines != nil
+			var lines [][]StyledRun
+			if valid {
+				// Copy the outer slice so previously dispatched frames are
+				// never mutated, then patch in the changed lines
+				lines = make([][]StyledRun, len(b.lastLines))
+				copy(lines, b.lastLines)
+				for _, change := range msg.Changes {
+					if change.Y >= 0 && change.Y < len(lines) {
+						lines[change.Y] = change.Runs.toRuns()
+					}
+				}
+				b.lastLines = lines
+			}
+			b.mu.Unlock()
+			if !valid {
+				// No full frame cached yet; the bridge re-sends one periodically
+				logging.Debug("Bridge: dropping content-delta without base frame")
+				continue
+			}
 			if handler != nil {
 				content := &StyledContent{
 					SessionID: msg.SessionID,
+					Lines:     lines,
 					Cols:      msg.Cols,
 					Rows:      msg.Rows,
 				}
 				if msg.Cursor != nil {
 					content.Cursor = *msg.Cursor
 				}
-				json.Unmarshal(msg.Lines, &content.Lines)
 				handler(content)
 			}
 
@@ -326,7 +441,7 @@ func (b *PythonBridge) readOutput() {
 				content := &StyledContent{
 					SessionID: msg.SessionID,
 				}
-				json.Unmarshal(msg.Lines, &content.Lines)
+				content.Lines = decodeSoALines(msg.Lines)
 				handler(content)
 			}
 
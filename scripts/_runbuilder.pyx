@@ -0,0 +1,31 @@
+# cython: language_level=3
+"""Optional Cython accelerator for the iTerm2 bridge hot loop.
+
+Groups adjacent cells with equal style keys into (start, stop) spans using
+C integer counters, removing the interpreter dispatch of the pure-Python
+walk in iterm2_bridge.py. The bridge falls back to the Python
+implementation when this module isn't compiled.
+
+Build inside the bridge venv (requires Cython and a C compiler):
+
+    cd scripts && venv/bin/pip install cython && venv/bin/cythonize -i _runbuilder.pyx
+"""
+
+
+def build_spans(list keys):
+    """Return [(start, stop), ...] spans of adjacent equal entries in keys."""
+    cdef Py_ssize_t n = len(keys)
+    cdef Py_ssize_t start = 0
+    cdef Py_ssize_t i
+    spans = []
+    if n == 0:
+        return spans
+    prev = keys[0]
+    for i in range(1, n):
+        k = keys[i]
+        if k is not prev and k != prev:
+            spans.append((start, i))
+            start = i
+            prev = k
+    spans.append((start, n))
+    return spans
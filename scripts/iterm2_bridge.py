@@ -14,29 +14,91 @@ Responses (stdout):
   {"type":"ready"}
   {"type":"profile","sessionId":"xxx","colors":{...}}
   {"type":"content","sessionId":"xxx","lines":[...],"cursor":{...},"cols":N,"rows":N}
+  {"type":"content-delta","sessionId":"xxx","changes":[{"y":N,"runs":{...}}],"cursor":{...},"cols":N,"rows":N}
   {"type":"history","sessionId":"xxx","lines":[...]}
   {"type":"error","message":"xxx"}
   {"type":"stopped"}
+
+Each line in "lines" (and each delta "runs" entry) is either null (empty
+line) or parallel arrays with one entry per styled run:
+  {"t":["text",...],"fg":["#rrggbb"|null,...],"bg":[...],"a":[bitmask,...]}
+"a" packs bold=1, italic=2, underline=4, strikethrough=8, inverse=16,
+faint=32.
 """
 
 import asyncio
+import concurrent.futures
+import functools
 import json
 import sys
+import time
 import iterm2
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Compiled accelerator for the run-grouping walk (see _runbuilder.pyx).
+    # Optional: the venv may not have Cython or a compiler.
+    from _runbuilder import build_spans
+except ImportError:
+    build_spans = None
+
+# orjson is 3-10x faster on the large per-frame payloads and returns bytes
+# directly (already compact); fall back to stdlib json if it isn't installed
+# in the bridge venv.
+if orjson:
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+else:
+    def _dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode()
+    _loads = json.loads
+
 # Globals
 streaming_task = None
 stop_event = None
+stdout_writer = None
+
+# Single worker keeps serialized frames in emission order while letting the
+# event loop fetch the next frame during dumps of large screens
+_json_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="emit-json"
+)
+
+
+async def init_stdout_writer():
+    """Wrap stdout in an asyncio StreamWriter so emit can await drain()
+    instead of blocking the event loop on a slow consumer."""
+    global stdout_writer
+    loop = asyncio.get_event_loop()
+    transport, protocol = await loop.connect_write_pipe(
+        asyncio.streams.FlowControlMixin, sys.stdout
+    )
+    stdout_writer = asyncio.StreamWriter(transport, protocol, None, loop)
 
 
-def emit(obj):
-    """Write a JSON line to stdout."""
-    sys.stdout.write(json.dumps(obj, separators=(',', ':')) + '\n')
-    sys.stdout.flush()
+async def emit(obj):
+    """Write a JSON line to stdout, honoring consumer backpressure.
+    Serialization of large frames runs on the executor thread so the event
+    loop stays free for the streamer and stdin."""
+    loop = asyncio.get_event_loop()
+    data = await loop.run_in_executor(_json_executor, _dumps, obj)
+    if stdout_writer is not None:
+        stdout_writer.write(data)
+        stdout_writer.write(b'\n')
+        await stdout_writer.drain()
+    else:
+        # Fallback if the write pipe couldn't be wrapped
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.write(b'\n')
+        sys.stdout.buffer.flush()
 
 
-def emit_error(msg):
-    emit({"type": "error", "message": str(msg)})
+async def emit_error(msg):
+    await emit({"type": "error", "message": str(msg)})
 
 
 # --- Color Resolution ---
@@ -78,30 +140,54 @@ def get_profile_colors(profile):
     return colors
 
 
-def resolve_cell_color(color, ansi_palette):
+@functools.lru_cache(maxsize=1024)
+def _rgb_hex(r, g, b):
+    """Format an RGB triple as '#rrggbb'. Cached - real terminals use a
+    handful of distinct colors, so each is formatted once per session."""
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+# Indices 16-231 (6x6x6 color cube) and 232-255 (grayscale ramp) of the
+# xterm palette are fixed; only 0-15 vary per profile. Computed once at
+# import.
+_XTERM256_HIGH = tuple(
+    _rgb_hex((idx // 36) * 51, ((idx % 36) // 6) * 51, (idx % 6) * 51)
+    for idx in range(216)
+) + tuple(_rgb_hex(v, v, v) for v in range(8, 248, 10))
+
+_palette_cache = {}
+
+
+def build_palette256(ansi_palette):
+    """Pre-resolve all 256 indexed colors to hex strings: profile ANSI for
+    0-15, the constant _XTERM256_HIGH table above 16. Cached per distinct
+    ANSI palette, so switching back and forth between sessions with the
+    same profile reuses one list and standard-color resolution stays a
+    single list index per cell."""
+    low = tuple(ansi_palette[:16])
+    palette256 = _palette_cache.get(low)
+    if palette256 is None:
+        palette256 = list(low)
+        while len(palette256) < 16:
+            palette256.append("#c7c7c7")
+        palette256.extend(_XTERM256_HIGH)
+        _palette_cache[low] = palette256
+    return palette256
+
+
+def resolve_cell_color(color, palette256):
     """Resolve a CellStyle.Color to hex string. Returns None for default."""
     if color is None:
         return None
 
     if color.is_rgb:
         rgb = color.rgb
-        return f"#{rgb.red:02x}{rgb.green:02x}{rgb.blue:02x}"
+        return _rgb_hex(rgb.red, rgb.green, rgb.blue)
     elif color.is_standard:
         idx = color.standard
-        if 0 <= idx < 16 and idx < len(ansi_palette):
-            return ansi_palette[idx]
-        elif 16 <= idx < 232:
-            # 6x6x6 color cube
-            idx -= 16
-            r = (idx // 36) * 51
-            g = ((idx % 36) // 6) * 51
-            b = (idx % 6) * 51
-            return f"#{r:02x}{g:02x}{b:02x}"
-        elif 232 <= idx < 256:
-            v = (idx - 232) * 10 + 8
-            return f"#{v:02x}{v:02x}{v:02x}"
+        if 0 <= idx < 256:
+            return palette256[idx]
     elif color.is_alternate:
-        alt = color.alternate
         # DEFAULT means use profile fg/bg color
         return None
 
@@ -110,194 +196,256 @@ def resolve_cell_color(color, ansi_palette):
 
 # --- Screen Content Processing ---
 
-def process_line_contents(line_contents_list, ansi_palette, cols=80):
-    """Convert List[LineContents] (from async_get_contents) to wire format.
-    Each LineContents has .string, .string_at(x), .style_at(x)."""
-    lines = []
-    for line in line_contents_list:
-        text = line.string.replace('\x00', ' ')
-        runs = []
-
-        if not text.strip():
-            lines.append(runs)
-            continue
+# Attribute bits in the wire bitmask (must match the Go decoder)
+ATTR_BOLD = 1
+ATTR_ITALIC = 2
+ATTR_UNDERLINE = 4
+ATTR_STRIKETHROUGH = 8
+ATTR_INVERSE = 16
+ATTR_FAINT = 32
 
-        current_text = ""
-        current_style = None
 
-        for x in range(len(text)):
-            char = text[x]
-            style = line.style_at(x)
-            style_dict = style_to_dict(style, ansi_palette) if style else {}
+def style_key(style, palette256):
+    """Map a CellStyle to its (fg, bg, attr-bitmask) wire triple - also the
+    hashable discriminator for run grouping. Returns None for unstyled
+    cells. Three small immutables compare far faster than per-cell dicts."""
+    if style is None:
+        return None
 
-            if style_dict == current_style:
-                current_text += char
-            else:
-                if current_text:
-                    run = {"t": current_text}
-                    if current_style:
-                        run.update(current_style)
-                    runs.append(run)
-                current_text = char
-                current_style = style_dict
-
-        if current_text:
-            run = {"t": current_text}
-            if current_style:
-                run.update(current_style)
-            runs.append(run)
-
-        lines.append(runs)
+    attr = 0
+    if style.bold:
+        attr |= ATTR_BOLD
+    if style.italic:
+        attr |= ATTR_ITALIC
+    if style.underline:
+        attr |= ATTR_UNDERLINE
+    if style.strikethrough:
+        attr |= ATTR_STRIKETHROUGH
+    if style.inverse:
+        attr |= ATTR_INVERSE
+    # faint is missing on older iterm2 module versions
+    if getattr(style, 'faint', False):
+        attr |= ATTR_FAINT
+
+    return (
+        resolve_cell_color(style.fg_color, palette256),
+        resolve_cell_color(style.bg_color, palette256),
+        attr,
+    )
+
+
+def _build_spans_py(keys):
+    """Pure-Python fallback for _runbuilder.build_spans: group adjacent
+    equal keys into (start, stop) spans."""
+    spans = []
+    n = len(keys)
+    if n == 0:
+        return spans
+    start = 0
+    prev = keys[0]
+    for i in range(1, n):
+        k = keys[i]
+        if k is not prev and k != prev:
+            spans.append((start, i))
+            start = i
+            prev = k
+    spans.append((start, n))
+    return spans
+
+
+if build_spans is None:
+    build_spans = _build_spans_py
+
+
+def line_to_runs(line, palette256):
+    """Convert one line (ScreenContents line or LineContents) to wire
+    format: parallel arrays {"t": [...], "fg": [...], "bg": [...],
+    "a": [...]} with one entry per styled run, or None for an empty line.
+    fg/bg entries are hex strings (None for default); "a" entries pack the
+    boolean attributes into a bitmask. Gathers the per-cell styles first,
+    maps them to hashable keys (reusing the key while the style object is
+    identical), then groups equal adjacent keys into spans - the tight walk
+    runs in _runbuilder's compiled build_spans when available."""
+    text = line.string.replace('\x00', ' ')
+    if not text.strip():
+        return None
 
+    # Newer iterm2 modules expose the per-line style array directly; one
+    # attribute read then replaces len(text) style_at() calls
+    cells = getattr(line, 'cells', None)
+    if cells is not None and len(cells) >= len(text):
+        styles = cells[:len(text)]
+    else:
+        style_at = line.style_at
+        styles = [style_at(x) for x in range(len(text))]
+
+    keys = []
+    prev_style = None
+    prev_key = None
+    for style in styles:
+        if style is not prev_style:
+            prev_key = style_key(style, palette256)
+            prev_style = style
+        keys.append(prev_key)
+
+    texts = []
+    fgs = []
+    bgs = []
+    attrs = []
+    for start, stop in build_spans(keys):
+        key = keys[start]
+        texts.append(text[start:stop])
+        if key is None:
+            fgs.append(None)
+            bgs.append(None)
+            attrs.append(0)
+        else:
+            fgs.append(key[0])
+            bgs.append(key[1])
+            attrs.append(key[2])
+
+    return {"t": texts, "fg": fgs, "bg": bgs, "a": attrs}
+
+
+def process_line_contents(line_contents_list, palette256, cols=80):
+    """Convert List[LineContents] (from async_get_contents) to wire format.
+    Each LineContents has .string, .string_at(x), .style_at(x)."""
+    lines = []
+    for line in line_contents_list:
+        lines.append(line_to_runs(line, palette256))
     return lines
 
 
-def process_screen_contents(contents, ansi_palette, cols=80):
-    """Convert ScreenContents to wire format (list of lines, each a list of runs).
+def process_screen_contents(contents, palette256, cols=80):
+    """Convert ScreenContents to wire format (list of lines, each SoA run
+    arrays or None when empty).
     Replaces NUL bytes in line.string with spaces (iTerm2 uses \\x00 for empty cells)."""
     lines = []
     num_lines = contents.number_of_lines
 
     for i in range(num_lines):
-        line = contents.line(i)
-        text = line.string.replace('\x00', ' ')
-        runs = []
-
-        if not text.strip():
-            lines.append(runs)
-            continue
-
-        current_text = ""
-        current_style = None
-
-        for x in range(len(text)):
-            char = text[x]
-            style = line.style_at(x)
-            style_dict = style_to_dict(style, ansi_palette) if style else {}
-
-            if style_dict == current_style:
-                current_text += char
-            else:
-                if current_text:
-                    run = {"t": current_text}
-                    if current_style:
-                        run.update(current_style)
-                    runs.append(run)
-                current_text = char
-                current_style = style_dict
-
-        if current_text:
-            run = {"t": current_text}
-            if current_style:
-                run.update(current_style)
-            runs.append(run)
-
-        lines.append(runs)
+        lines.append(line_to_runs(contents.line(i), palette256))
 
     return lines
 
 
-def style_to_dict(style, ansi_palette):
-    """Convert CellStyle to compact dict."""
-    if style is None:
-        return {}
-
-    d = {}
-
-    try:
-        fg = resolve_cell_color(style.fg_color, ansi_palette)
-        if fg:
-            d["fg"] = fg
-    except Exception:
-        pass
-
-    try:
-        bg = resolve_cell_color(style.bg_color, ansi_palette)
-        if bg:
-            d["bg"] = bg
-    except Exception:
-        pass
-
-    try:
-        if style.bold:
-            d["b"] = True
-    except Exception:
-        pass
-
-    try:
-        if style.italic:
-            d["i"] = True
-    except Exception:
-        pass
-
-    try:
-        if style.underline:
-            d["u"] = True
-    except Exception:
-        pass
-
-    try:
-        if style.strikethrough:
-            d["s"] = True
-    except Exception:
-        pass
-
-    try:
-        if style.inverse:
-            d["inv"] = True
-    except Exception:
-        pass
+# --- Streaming ---
 
-    try:
-        if style.faint:
-            d["f"] = True
-    except Exception:
-        pass
+# Re-send a full frame at least this often so delta consumers can resync
+FULL_FRAME_INTERVAL = 2.0
 
-    return d
+# Never emit faster than this; iTerm2 can push updates far faster than
+# anyone renders them, and the cap bounds the bridge's CPU usage
+MIN_FRAME_INTERVAL = 1 / 30
 
 
-# --- Streaming ---
+async def stream_session(connection, session_id, palette256):
+    """Stream styled content from a session using ScreenStreamer.
 
-async def stream_session(connection, session_id, ansi_palette):
-    """Stream styled content from a session using ScreenStreamer."""
+    Emits a full "content" frame on start, on resize and every
+    FULL_FRAME_INTERVAL seconds; in between, emits "content-delta" frames
+    carrying only the lines that changed (nothing at all when the screen is
+    quiescent)."""
     global stop_event
 
     app = await iterm2.async_get_app(connection)
     session = app.get_session_by_id(session_id)
     if not session:
-        emit_error(f"Session not found: {session_id}")
+        await emit_error(f"Session not found: {session_id}")
         return
 
     stop_event = asyncio.Event()
 
+    # Grid size only changes on resize, so read it once and keep it fresh
+    # via the session's columns/rows variables instead of re-reading (and
+    # guarding) session.grid_size on every frame
+    try:
+        size = [session.grid_size.width, session.grid_size.height]
+    except Exception:
+        size = [80, 25]
+
+    async def watch_grid_var(name, index):
+        try:
+            async with iterm2.VariableMonitor(
+                connection, iterm2.VariableScopes.SESSION, name, session_id
+            ) as monitor:
+                while True:
+                    value = await monitor.async_get()
+                    try:
+                        size[index] = int(value)
+                    except (TypeError, ValueError):
+                        pass
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Monitor unavailable; keep the last known size
+            pass
+
+    size_tasks = [
+        asyncio.ensure_future(watch_grid_var("columns", 0)),
+        asyncio.ensure_future(watch_grid_var("rows", 1)),
+    ]
+
+    prev_lines = None
+    prev_cursor = None
+    prev_size = None
+    last_full_emit = 0.0
+    last_frame_ts = 0.0
+
+    get_task = None
+    # Created once and raced against every get; when stop_event is set the
+    # wait below returns immediately instead of polling on a timeout
+    stop_task = asyncio.ensure_future(stop_event.wait())
     try:
         async with session.get_screen_streamer(want_contents=True) as streamer:
             while not stop_event.is_set():
-                try:
-                    contents = await asyncio.wait_for(
-                        streamer.async_get(style=True),
-                        timeout=2.0
+                if get_task is None:
+                    get_task = asyncio.ensure_future(
+                        streamer.async_get(style=True)
                     )
-                except asyncio.TimeoutError:
-                    if stop_event.is_set():
-                        break
-                    continue
+                await asyncio.wait(
+                    {get_task, stop_task},
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if stop_task.done() or not get_task.done():
+                    break
+                contents = get_task.result()
+                get_task = None
 
                 if contents is None or stop_event.is_set():
                     break
 
+                # Cap the frame rate: sleep off any remainder of the frame
+                # budget, then let the coalescing drain below pick up
+                # whatever arrived in the meantime
+                dt = time.monotonic() - last_frame_ts
+                if dt < MIN_FRAME_INTERVAL:
+                    await asyncio.sleep(MIN_FRAME_INTERVAL - dt)
+                    if stop_event.is_set():
+                        break
+
+                # Coalesce bursts: when updates arrive faster than we emit
+                # (top, build logs), keep only the freshest one. Intermediate
+                # frames would be overwritten before anyone rendered them.
+                # A pending get is kept for the next loop iteration.
+                while True:
+                    get_task = asyncio.ensure_future(
+                        streamer.async_get(style=True)
+                    )
+                    done, _ = await asyncio.wait({get_task}, timeout=0)
+                    if not done:
+                        break
+                    newer = get_task.result()
+                    get_task = None
+                    if newer is None:
+                        break
+                    contents = newer
+
                 cursor_x = contents.cursor_coord.x
                 cursor_y = contents.cursor_coord.y
+                cols, rows = size
 
-                try:
-                    cols = session.grid_size.width
-                    rows = session.grid_size.height
-                except Exception:
-                    cols = 80
-                    rows = 25
-
-                screen_lines = process_screen_contents(contents, ansi_palette, cols)
+                screen_lines = process_screen_contents(contents, palette256, cols)
 
                 # Fetch recent scrollback (2x screen height) for extra context
                 scrollback_lines = []
@@ -310,38 +458,70 @@ async def stream_session(connection, session_id, ansi_palette):
                         fetch_count = min(extra, sb_count)
                         first_line = overflow + sb_count - fetch_count
                         sb_contents = await session.async_get_contents(first_line, fetch_count)
-                        scrollback_lines = process_line_contents(sb_contents, ansi_palette, cols)
+                        scrollback_lines = process_line_contents(sb_contents, palette256, cols)
                 except Exception:
                     pass
 
                 lines = scrollback_lines + screen_lines
+                cursor = {"x": cursor_x, "y": cursor_y + len(scrollback_lines)}
+
+                now = time.monotonic()
+                need_full = (
+                    prev_lines is None
+                    or len(lines) != len(prev_lines)
+                    or (cols, rows) != prev_size
+                    or now - last_full_emit >= FULL_FRAME_INTERVAL
+                )
 
-                emit({
-                    "type": "content",
-                    "sessionId": session_id,
-                    "lines": lines,
-                    "cursor": {"x": cursor_x, "y": cursor_y + len(scrollback_lines)},
-                    "cols": cols,
-                    "rows": rows,
-                })
+                if need_full:
+                    await emit({
+                        "type": "content",
+                        "sessionId": session_id,
+                        "lines": lines,
+                        "cursor": cursor,
+                        "cols": cols,
+                        "rows": rows,
+                    })
+                    last_full_emit = now
+                else:
+                    changes = [
+                        {"y": y, "runs": lines[y]}
+                        for y in range(len(lines))
+                        if lines[y] != prev_lines[y]
+                    ]
+                    if changes or cursor != prev_cursor:
+                        await emit({
+                            "type": "content-delta",
+                            "sessionId": session_id,
+                            "changes": changes,
+                            "cursor": cursor,
+                            "cols": cols,
+                            "rows": rows,
+                        })
+
+                prev_lines = lines
+                prev_cursor = cursor
+                prev_size = (cols, rows)
+                last_frame_ts = time.monotonic()
     except iterm2.rpc.RPCException as e:
-        emit_error(f"Session disconnected: {e}")
+        await emit_error(f"Session disconnected: {e}")
     except Exception as e:
-        emit_error(f"Streaming error: {e}")
+        await emit_error(f"Streaming error: {e}")
+    finally:
+        if get_task is not None and not get_task.done():
+            get_task.cancel()
+        if not stop_task.done():
+            stop_task.cancel()
+        for task in size_tasks:
+            task.cancel()
 
 
 # --- Command Processing ---
 
-async def process_command(connection, cmd_str):
-    """Process a single command from stdin. Returns True to quit."""
+async def process_command(connection, cmd):
+    """Process a single decoded command. Returns True to quit."""
     global streaming_task, stop_event
 
-    try:
-        cmd = json.loads(cmd_str.strip())
-    except json.JSONDecodeError:
-        emit_error("Invalid JSON")
-        return False
-
     action = cmd.get("cmd")
 
     if action == "quit":
@@ -365,15 +545,17 @@ async def process_command(connection, cmd_str):
             except (asyncio.CancelledError, Exception):
                 pass
             streaming_task = None
-        emit({"type": "stopped"})
+        await emit({"type": "stopped"})
 
     elif action == "watch":
         session_id = cmd.get("sessionId")
         if not session_id:
-            emit_error("Missing sessionId")
+            await emit_error("Missing sessionId")
             return False
 
-        # Stop current streaming
+        # Stop current streaming. Awaiting the cancelled task runs the
+        # streamer's __aexit__ to completion, so no settle delay is needed
+        # before starting the next stream.
         if stop_event:
             stop_event.set()
         if streaming_task and not streaming_task.done():
@@ -382,21 +564,20 @@ async def process_command(connection, cmd_str):
                 await streaming_task
             except (asyncio.CancelledError, Exception):
                 pass
-
-        await asyncio.sleep(0.05)
+            streaming_task = None
 
         # Get profile colors
         app = await iterm2.async_get_app(connection)
         session = app.get_session_by_id(session_id)
         if not session:
-            emit_error(f"Session not found: {session_id}")
+            await emit_error(f"Session not found: {session_id}")
             return False
 
         profile = await session.async_get_profile()
         palette = get_profile_colors(profile)
-        ansi_palette = palette["ansi"]
+        palette256 = build_palette256(palette["ansi"])
 
-        emit({"type": "profile", "sessionId": session_id, "colors": palette})
+        await emit({"type": "profile", "sessionId": session_id, "colors": palette})
 
         # Fetch initial content so terminal shows current state immediately
         try:
@@ -407,7 +588,7 @@ async def process_command(connection, cmd_str):
                     rows = session.grid_size.height
                 except Exception:
                     cols, rows = 80, 25
-                screen_lines = process_screen_contents(initial, ansi_palette, cols)
+                screen_lines = process_screen_contents(initial, palette256, cols)
 
                 # Fetch recent scrollback (2x screen height) for extra context
                 scrollback_lines = []
@@ -420,12 +601,12 @@ async def process_command(connection, cmd_str):
                         fetch_count = min(extra, sb_count)
                         first_line = overflow + sb_count - fetch_count
                         sb_contents = await session.async_get_contents(first_line, fetch_count)
-                        scrollback_lines = process_line_contents(sb_contents, ansi_palette, cols)
+                        scrollback_lines = process_line_contents(sb_contents, palette256, cols)
                 except Exception:
                     pass
 
                 init_lines = scrollback_lines + screen_lines
-                emit({
+                await emit({
                     "type": "content",
                     "sessionId": session_id,
                     "lines": init_lines,
@@ -434,29 +615,29 @@ async def process_command(connection, cmd_str):
                     "rows": rows,
                 })
         except Exception as e:
-            emit_error(f"Initial fetch failed: {e}")
+            await emit_error(f"Initial fetch failed: {e}")
 
         # Start streaming for ongoing updates
         streaming_task = asyncio.create_task(
-            stream_session(connection, session_id, ansi_palette)
+            stream_session(connection, session_id, palette256)
         )
 
     elif action == "history":
         session_id = cmd.get("sessionId")
         if not session_id:
-            emit_error("Missing sessionId")
+            await emit_error("Missing sessionId")
             return False
 
         app = await iterm2.async_get_app(connection)
         session = app.get_session_by_id(session_id)
         if not session:
-            emit_error(f"Session not found: {session_id}")
+            await emit_error(f"Session not found: {session_id}")
             return False
 
         try:
             profile = await session.async_get_profile()
             palette = get_profile_colors(profile)
-            ansi_palette = palette["ansi"]
+            palette256 = build_palette256(palette["ansi"])
 
             try:
                 cols = session.grid_size.width
@@ -473,38 +654,55 @@ async def process_command(connection, cmd_str):
                 history_line_contents = await session.async_get_contents(
                     overflow, scrollback_count
                 )
-                history_lines = process_line_contents(history_line_contents, ansi_palette, cols)
-                emit({
+                history_lines = process_line_contents(history_line_contents, palette256, cols)
+                await emit({
                     "type": "history",
                     "sessionId": session_id,
                     "lines": history_lines,
                 })
             else:
-                emit({
+                await emit({
                     "type": "history",
                     "sessionId": session_id,
                     "lines": [],
                 })
         except Exception as e:
-            emit_error(f"History fetch failed: {e}")
+            await emit_error(f"History fetch failed: {e}")
 
     return False
 
 
 # --- Stdin Reader ---
 
-async def read_stdin(connection):
-    """Read commands from stdin line by line."""
-    loop = asyncio.get_event_loop()
-    reader = asyncio.StreamReader()
-    protocol = asyncio.StreamReaderProtocol(reader)
-    await loop.connect_read_pipe(lambda: protocol, sys.stdin)
-
+async def read_stdin(reader, queue):
+    """Reader task: decode command lines the moment they arrive and queue
+    them for the processor task, so stdin is never blocked behind a
+    long-running command. stop/quit flip stop_event right away, letting an
+    in-flight stream wind down before its turn in the queue comes up."""
     while True:
         line = await reader.readline()
         if not line:
             break
-        should_quit = await process_command(connection, line.decode())
+        try:
+            cmd = _loads(line.strip())
+        except ValueError:
+            await emit_error("Invalid JSON")
+            continue
+        if cmd.get("cmd") in ("stop", "quit") and stop_event:
+            stop_event.set()
+        await queue.put(cmd)
+
+    # EOF: tell the processor to shut down
+    await queue.put(None)
+
+
+async def process_commands(connection, queue):
+    """Processor task: consume queued commands in order until quit or EOF."""
+    while True:
+        cmd = await queue.get()
+        if cmd is None:
+            break
+        should_quit = await process_command(connection, cmd)
         if should_quit:
             break
 
@@ -520,8 +718,26 @@ async def read_stdin(connection):
 
 async def main(connection):
     """Main coroutine - called after iTerm2 connection established."""
-    emit({"type": "ready"})
-    await read_stdin(connection)
+    try:
+        await init_stdout_writer()
+    except Exception:
+        # emit falls back to blocking writes
+        pass
+    await emit({"type": "ready"})
+
+    loop = asyncio.get_event_loop()
+    reader = asyncio.StreamReader()
+    protocol = asyncio.StreamReaderProtocol(reader)
+    await loop.connect_read_pipe(lambda: protocol, sys.stdin)
+
+    # Long-lived reader and processor tasks: control (stdin) and data
+    # (streaming) paths no longer serialize each other
+    queue = asyncio.Queue()
+    reader_task = asyncio.ensure_future(read_stdin(reader, queue))
+    try:
+        await process_commands(connection, queue)
+    finally:
+        reader_task.cancel()
 
 
 iterm2.run_until_complete(main)